@@ -1,5 +1,7 @@
 import os
+import time
 import psycopg2
+from psycopg2 import pool
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -8,18 +10,88 @@ load_dotenv()
 # You can also hardcode the connection string here for quick testing
 POSTGRES_URL = os.getenv("POSTGRES_URL") or "postgresql://eda_user:MyStrongPassword@<REMOTE_IP>:5432/eda_memory"
 
+# Connections idle for longer than this are closed instead of being kept warm forever
+POOL_IDLE_TIMEOUT = int(os.getenv("POSTGRES_POOL_IDLE_TIMEOUT", "300"))
+
+
+class CachingConnectionPool(pool.ThreadedConnectionPool):
+    """ThreadedConnectionPool that closes pooled connections left idle too long."""
+
+    def __init__(self, minconn, maxconn, *args, idle_timeout=POOL_IDLE_TIMEOUT, **kwargs):
+        self.idle_timeout = idle_timeout
+        self._last_used = {}
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def _connect(self, key=None):
+        # Every new connection (including the minconn opened in __init__) starts its idle clock now
+        conn = super()._connect(key)
+        self._last_used[id(conn)] = time.monotonic()
+        return conn
+
+    def getconn(self, key=None):
+        self._expire_idle()
+        return super().getconn(key)
+
+    def putconn(self, conn=None, key=None, close=False):
+        with self._lock:
+            self._putconn(conn, key, close)
+            if conn.closed:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+
+    def _expire_idle(self):
+        # Age alone decides; getconn() opens a fresh connection if this empties the pool
+        now = time.monotonic()
+        with self._lock:
+            keep = []
+            for conn in self._pool:
+                if now - self._last_used.get(id(conn), 0.0) > self.idle_timeout:
+                    self._last_used.pop(id(conn), None)
+                    conn.close()
+                else:
+                    keep.append(conn)
+            self._pool[:] = keep
+
+
+# Warm connections are reused across checks instead of reconnecting every call.
+# For pooling shared across processes, psycopg 3's psycopg_pool.ConnectionPool
+# (run behind pgbouncer) is the drop-in alternative.
+_POOL = None
+
+
+def get_pool():
+    global _POOL
+    if _POOL is None:
+        _POOL = CachingConnectionPool(minconn=1, maxconn=8, dsn=POSTGRES_URL)
+    return _POOL
+
+
+def close_pool():
+    global _POOL
+    if _POOL is not None:
+        _POOL.closeall()
+        _POOL = None
+
+
 def test_connection():
     try:
-        conn = psycopg2.connect(POSTGRES_URL)
-        cursor = conn.cursor()
-        cursor.execute("SELECT version();")
-        version = cursor.fetchone()
-        print("✅ Connected to PostgreSQL Server. Version:", version[0])
-        cursor.close()
-        conn.close()
+        conn_pool = get_pool()
+        conn = conn_pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT version();")
+            version = cursor.fetchone()
+            print("✅ Connected to PostgreSQL Server. Version:", version[0])
+            cursor.close()
+        finally:
+            conn_pool.putconn(conn)
     except Exception as e:
         print("❌ Failed to connect to PostgreSQL Server.")
         print("Error:", str(e))
 
 if __name__ == "__main__":
-    test_connection()
+    try:
+        test_connection()
+    finally:
+        close_pool()
@@ -2,6 +2,31 @@ from airflow.models import BaseOperator
 from typing import Any
 from airflow.models.dag import DagContext
 
+_NUMERIC_TYPES = frozenset({"FLOAT64", "INT64"})
+
+_NON_NUMERIC_TPL = """
+                    SELECT "{col_name}" AS variable, "{src_type}" AS data_type,
+                    (CASE WHEN a.cust_mkt_cd = "US" THEN "US" ELSE "INTL" END) AS Mkt,
+                    CAST(NULL AS FLOAT64) AS ric_zero_count, CAST(NULL AS FLOAT64) AS lumi_zero_count,
+                    CAST(NULL AS FLOAT64) AS ric_mean, CAST(NULL AS FLOAT64) AS lumi_mean,
+                    COUNT(*) AS tot_cnt, COUNT(a.{col_name}) AS ric_count, COUNT(b.{col_name}) AS lumi_count
+                    FROM `{src_prj}.{src_tbl}` a
+                    INNER JOIN `{dest_prj}.{dest_tbl}` b ON a.cust_xref_id = b.cust_xref_id
+                    GROUP BY variable, data_type, Mkt
+                """
+
+_NUMERIC_TPL = """
+                    SELECT "{col_name}" AS variable, "{src_type}" AS data_type,
+                    (CASE WHEN a.cust_mkt_cd = "US" THEN "US" ELSE "INTL" END) AS Mkt,
+                    COUNT(*) AS tot_cnt, COUNT(a.{col_name}) AS ric_count, COUNT(b.{col_name}) AS lumi_count,
+                    SUM(CASE WHEN a.{col_name} = 0 THEN 1 ELSE 0 END) AS ric_zero_count,
+                    SUM(CASE WHEN b.{col_name} = 0 THEN 1 ELSE 0 END) AS lumi_zero_count,
+                    AVG(a.{col_name}) AS ric_mean, AVG(b.{col_name}) AS lumi_mean
+                    FROM `{src_prj}.{src_tbl}` a
+                    INNER JOIN `{dest_prj}.{dest_tbl}` b ON a.cust_xref_id = b.cust_xref_id
+                    GROUP BY variable, data_type, Mkt
+                """
+
 class Reports(BaseOperator):
 
     @staticmethod
@@ -45,41 +70,19 @@ class Reports(BaseOperator):
         dest_cols = ti.xcom_pull(task_ids='fetch_target_columns')
 
         dest_col_map = {col["column_name"]: col["data_type"] for col in dest_cols}
-        query_parts = []
-
-        for col in src_cols:
-            col_name = col["column_name"]
-            src_type = col["data_type"]
-            dest_type = dest_col_map.get(col_name)
-
-            if dest_type is None or src_type != dest_type:
-                continue
-
-            if src_type not in ["FLOAT64", "INT64"]:
-                query_parts.append(f"""
-                    SELECT "{col_name}" AS variable, "{src_type}" AS data_type,
-                    (CASE WHEN a.cust_mkt_cd = "US" THEN "US" ELSE "INTL" END) AS Mkt,
-                    CAST(NULL AS FLOAT64) AS ric_zero_count, CAST(NULL AS FLOAT64) AS lumi_zero_count,
-                    CAST(NULL AS FLOAT64) AS ric_mean, CAST(NULL AS FLOAT64) AS lumi_mean,
-                    COUNT(*) AS tot_cnt, COUNT(a.{col_name}) AS ric_count, COUNT(b.{col_name}) AS lumi_count
-                    FROM `{src_prj}.{src_tbl}` a
-                    INNER JOIN `{dest_prj}.{dest_tbl}` b ON a.cust_xref_id = b.cust_xref_id
-                    GROUP BY variable, data_type, Mkt
-                """)
-            else:
-                query_parts.append(f"""
-                    SELECT "{col_name}" AS variable, "{src_type}" AS data_type,
-                    (CASE WHEN a.cust_mkt_cd = "US" THEN "US" ELSE "INTL" END) AS Mkt,
-                    COUNT(*) AS tot_cnt, COUNT(a.{col_name}) AS ric_count, COUNT(b.{col_name}) AS lumi_count,
-                    SUM(CASE WHEN a.{col_name} = 0 THEN 1 ELSE 0 END) AS ric_zero_count,
-                    SUM(CASE WHEN b.{col_name} = 0 THEN 1 ELSE 0 END) AS lumi_zero_count,
-                    AVG(a.{col_name}) AS ric_mean, AVG(b.{col_name}) AS lumi_mean
-                    FROM `{src_prj}.{src_tbl}` a
-                    INNER JOIN `{dest_prj}.{dest_tbl}` b ON a.cust_xref_id = b.cust_xref_id
-                    GROUP BY variable, data_type, Mkt
-                """)
-
-        combined_query = "\nUNION ALL\n".join(query_parts)
+        matching = [
+            (col["column_name"], col["data_type"])
+            for col in src_cols
+            if dest_col_map.get(col["column_name"]) == col["data_type"]
+        ]
+
+        tables = {"src_prj": src_prj, "src_tbl": src_tbl, "dest_prj": dest_prj, "dest_tbl": dest_tbl}
+        combined_query = "\nUNION ALL\n".join(
+            (_NUMERIC_TPL if src_type in _NUMERIC_TYPES else _NON_NUMERIC_TPL).format_map(
+                {"col_name": col_name, "src_type": src_type, **tables}
+            )
+            for col_name, src_type in matching
+        )
         final_query = f"""
         CREATE OR REPLACE TABLE `{temp_table}` AS
         {combined_query}
@@ -1,17 +1,95 @@
 import os
 import json
+import asyncio
 import tempfile
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Optional
+from uuid import uuid4
+from typing import Any, ClassVar, Optional
+import numpy as np
 import librosa
 import soundfile as sf
+from scipy import ndimage, signal
 import speech_recognition as sr
 from langchain_openai import ChatOpenAI
 from langchain.tools import BaseTool
 from crewai import Agent, Task, Crew, Process
 
-# Temp dir for intermediate files
-temp_dir = tempfile.mkdtemp()
+# Each pipeline run gets its own directory for intermediate files. AudioProcessingTool
+# creates it; every later tool writes into the run directory of the file it was handed
+# (or a fresh one if that file lives elsewhere), so concurrent runs never share output
+# paths. Hand-off files are removed once the next stage has read them, leaving only
+# the final .srt behind.
+RUN_DIR_PREFIX = "subs-"
+
+
+def new_run_dir() -> Path:
+    return Path(tempfile.mkdtemp(prefix=f"{RUN_DIR_PREFIX}{uuid4().hex[:8]}-"))
+
+
+def is_run_dir(path: Path) -> bool:
+    return path.parent == Path(tempfile.gettempdir()) and path.name.startswith(RUN_DIR_PREFIX)
+
+
+def run_dir_of(path: str) -> Path:
+    parent = Path(path).parent
+    return parent if is_run_dir(parent) else new_run_dir()
+
+
+def discard_handoff(path: str) -> None:
+    # Only files inside a run directory are ours to delete; never touch caller-provided inputs
+    if is_run_dir(Path(path).parent):
+        Path(path).unlink(missing_ok=True)
+
+# Processed waveforms keyed by the WAV path handed to the next agent, so
+# TranscriptionTool can pick up the array instead of decoding the file again.
+# Only the most recent few are kept; an entry whose path never comes back (reformatted
+# by the agent, or a failed crew) is dropped instead of pinning the waveform in memory.
+PROCESSED_AUDIO_CACHE_SIZE = 2
+_processed_audio = OrderedDict()
+_processed_audio_lock = threading.Lock()
+
+
+def remember_processed_audio(path: str, y: np.ndarray, sr_rate: int) -> None:
+    with _processed_audio_lock:
+        _processed_audio[path] = (y, sr_rate)
+        while len(_processed_audio) > PROCESSED_AUDIO_CACHE_SIZE:
+            _processed_audio.popitem(last=False)
+
+
+def take_processed_audio(path: str) -> Optional[tuple]:
+    with _processed_audio_lock:
+        return _processed_audio.pop(path, None)
+
+# STFT / HPSS settings (librosa defaults: n_fft=2048, hop_length=512, kernel_size=31)
+N_FFT = 2048
+HOP_LENGTH = 512
+HPSS_KERNEL = 31
+
+
+def enhance_vocals(y: np.ndarray) -> np.ndarray:
+    """Pre-emphasis, harmonic separation and peak normalization over one buffer."""
+    y = np.ascontiguousarray(y, dtype=np.float32)
+    n_samples = len(y)
+    y[1:] -= 0.97 * y[:-1]
+
+    # Short clips are zero-padded to one full frame so the STFT is always well-formed
+    if n_samples < N_FFT:
+        y = np.pad(y, (0, N_FFT - n_samples))
+
+    _, _, stft = signal.stft(y, nperseg=N_FFT, noverlap=N_FFT - HOP_LENGTH)
+    mag = np.abs(stft)
+    harmonic = ndimage.median_filter(mag, size=(1, HPSS_KERNEL)) ** 2
+    percussive = ndimage.median_filter(mag, size=(HPSS_KERNEL, 1)) ** 2
+    mask = harmonic / np.maximum(harmonic + percussive, np.finfo(np.float32).tiny)
+    _, y_harmonic = signal.istft(stft * mask, nperseg=N_FFT, noverlap=N_FFT - HOP_LENGTH)
+
+    y_out = y_harmonic[:n_samples].astype(np.float32, copy=False)
+    peak = np.max(np.abs(y_out), initial=0.0)
+    if peak > 0:
+        np.multiply(y_out, 1.0 / peak, out=y_out)
+    return y_out
 
 
 # === CUSTOM TOOL CLASSES ===
@@ -23,11 +101,10 @@ class AudioProcessingTool(BaseTool):
     def _run(self, input_file_path: str) -> str:
         try:
             y, sr_rate = librosa.load(input_file_path, sr=None)
-            y_filtered = librosa.effects.preemphasis(y)
-            y_harmonic, _ = librosa.effects.hpss(y_filtered)
-            y_normalized = librosa.util.normalize(y_harmonic)
-            processed_file = os.path.join(temp_dir, "processed_audio.wav")
-            sf.write(processed_file, y_normalized, sr_rate)
+            y_normalized = enhance_vocals(y)
+            processed_file = str(new_run_dir() / "processed_audio.wav")
+            sf.write(processed_file, y_normalized, sr_rate, subtype="PCM_16")
+            remember_processed_audio(processed_file, y_normalized, sr_rate)
             return processed_file
         except Exception as e:
             return f"Error processing audio: {str(e)}"
@@ -40,62 +117,91 @@ class TranscriptionTool(BaseTool):
     name: str = "transcribe_audio"
     description: str = "Transcribe processed audio to text."
     return_direct: bool = True
+    segment_length: int = 5
+    max_concurrent: int = 5
+    # Shared across runs; recognize_google keeps no per-call state on the recognizer
+    recognizer: ClassVar[sr.Recognizer] = sr.Recognizer()
 
-    def _run(self, processed_file_path: str) -> str:
-        recognizer = sr.Recognizer()
-        y, sr_rate = librosa.load(processed_file_path, sr=None)
-        duration = librosa.get_duration(y=y, sr=sr_rate)
-        segment_length = 5
-        segments = []
-        for i in range(0, int(duration), segment_length):
+    def _load_segments(self, processed_file_path: str) -> list:
+        cached = take_processed_audio(processed_file_path)
+        y, sr_rate = cached if cached is not None else librosa.load(processed_file_path, sr=None)
+        discard_handoff(processed_file_path)
+        # Convert to 16-bit PCM once for the whole track; segments are byte slices of it
+        pcm = (np.clip(y, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+        duration = len(y) / sr_rate
+        audio_segments = []
+        for i in range(0, int(duration), self.segment_length):
             start_sample = int(i * sr_rate)
-            end_sample = int(min((i + segment_length) * sr_rate, len(y)))
-            segment = y[start_sample:end_sample]
-            temp_seg_path = os.path.join(temp_dir, f"segment_{i}.wav")
-            sf.write(temp_seg_path, segment, sr_rate)
-            with sr.AudioFile(temp_seg_path) as source:
-                audio = recognizer.record(source)
-                try:
-                    text = recognizer.recognize_google(audio)
-                    if text:
-                        segments.append({"start": i, "end": i + segment_length, "text": text})
-                except:
-                    pass
-        json_path = os.path.join(temp_dir, "raw_transcription.json")
+            end_sample = int(min((i + self.segment_length) * sr_rate, len(y)))
+            raw = pcm[start_sample * 2:end_sample * 2]
+            audio_segments.append((i, sr.AudioData(raw, sample_rate=sr_rate, sample_width=2)))
+        return audio_segments
+
+    async def _transcribe_segments(self, audio_segments: list) -> list:
+        sem = asyncio.Semaphore(self.max_concurrent)
+
+        async def _do_segment(i, audio):
+            async with sem:
+                text = await asyncio.to_thread(self.recognizer.recognize_google, audio)
+            return {"start": i, "end": i + self.segment_length, "text": text}
+
+        results = await asyncio.gather(
+            *(_do_segment(i, audio) for i, audio in audio_segments),
+            return_exceptions=True
+        )
+        # gather keeps input order, so segments stay sorted by start time
+        return [r for r in results if isinstance(r, dict) and r["text"]]
+
+    def _write_segments(self, segments: list, run_dir: Path) -> str:
+        json_path = str(run_dir / "raw_transcription.json")
         with open(json_path, 'w') as f:
             json.dump(segments, f, indent=2)
         return json_path
 
+    def _run(self, processed_file_path: str) -> str:
+        return asyncio.run(self._arun(processed_file_path))
+
     async def _arun(self, processed_file_path: str) -> str:
-        return self._run(processed_file_path)
+        audio_segments = await asyncio.to_thread(self._load_segments, processed_file_path)
+        segments = await self._transcribe_segments(audio_segments)
+        return self._write_segments(segments, run_dir_of(processed_file_path))
 
 
 class SubtitleSyncTool(BaseTool):
     name: str = "synchronize_subtitles"
     description: str = "Align transcribed text with timestamps."
     return_direct: bool = True
+    chunk_size: int = 5
 
     def _run(self, transcription_file: str) -> str:
         with open(transcription_file, 'r') as f:
             segments = json.load(f)
+        discard_handoff(transcription_file)
         refined = []
-        for seg in segments:
-            text = seg['text']
-            duration = seg['end'] - seg['start']
-            if len(text.split()) > 7 and duration > 3:
-                words = text.split()
-                chunk_size = 5
-                chunks = [" ".join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
-                time_per_chunk = duration / len(chunks)
-                for idx, chunk in enumerate(chunks):
-                    refined.append({
-                        "start": seg['start'] + idx * time_per_chunk,
-                        "end": seg['start'] + (idx + 1) * time_per_chunk,
-                        "text": chunk
-                    })
-            else:
-                refined.append(seg)
-        sync_path = os.path.join(temp_dir, "synced_subtitles.json")
+        words = [seg['text'].split() for seg in segments]
+        n_segs = len(segments)
+        starts = np.fromiter((seg['start'] for seg in segments), dtype=np.float64, count=n_segs)
+        ends = np.fromiter((seg['end'] for seg in segments), dtype=np.float64, count=n_segs)
+        word_counts = np.fromiter((len(w) for w in words), dtype=np.int64, count=n_segs)
+
+        # Long segments are split into chunks of chunk_size words sharing the duration evenly
+        durations = ends - starts
+        split = (word_counts > 7) & (durations > 3)
+        n_chunks = np.where(split, -(-word_counts // self.chunk_size), 1)
+        time_per_chunk = durations / n_chunks
+        seg_of_chunk = np.repeat(np.arange(n_segs), n_chunks)
+        chunk_idx = np.arange(n_chunks.sum()) - np.repeat(np.cumsum(n_chunks) - n_chunks, n_chunks)
+        chunk_starts = starts[seg_of_chunk] + chunk_idx * time_per_chunk[seg_of_chunk]
+        chunk_ends = starts[seg_of_chunk] + (chunk_idx + 1) * time_per_chunk[seg_of_chunk]
+
+        for seg_i, idx, start, end in zip(seg_of_chunk.tolist(), chunk_idx.tolist(),
+                                          chunk_starts.tolist(), chunk_ends.tolist()):
+            if not split[seg_i]:
+                refined.append(segments[seg_i])
+                continue
+            chunk = words[seg_i][idx * self.chunk_size:(idx + 1) * self.chunk_size]
+            refined.append({"start": start, "end": end, "text": " ".join(chunk)})
+        sync_path = str(run_dir_of(transcription_file) / "synced_subtitles.json")
         with open(sync_path, 'w') as f:
             json.dump(refined, f, indent=2)
         return sync_path
@@ -108,30 +214,50 @@ class LyricsEnhancerTool(BaseTool):
     name: str = "enhance_lyrics"
     description: str = "Improve transcription for readability and format into SRT."
     return_direct: bool = True
+    # Optional chat model used to polish lines; without one the synced text is used as-is
+    llm: Optional[Any] = None
+    batch_size: int = 20
+
+    def _llm_enhance(self, subtitles: list) -> list:
+        enhanced = []
+        for b in range(0, len(subtitles), self.batch_size):
+            batch = subtitles[b:b + self.batch_size]
+            prompt = (
+                "Fix transcription errors in these consecutive lyric lines for readability. "
+                "Return only a JSON list of strings with exactly one entry per input line, in order.\n"
+                f"{json.dumps([sub['text'] for sub in batch])}"
+            )
+            try:
+                lines = json.loads(self.llm.invoke(prompt).content)
+            except Exception:
+                lines = None
+            if not isinstance(lines, list) or len(lines) != len(batch):
+                lines = [sub['text'] for sub in batch]
+            enhanced.extend(
+                {"start": sub['start'], "end": sub['end'], "text": str(text)}
+                for sub, text in zip(batch, lines)
+            )
+        return enhanced
 
     def _run(self, synced_file: str) -> str:
         with open(synced_file, 'r') as f:
             subtitles = json.load(f)
-        enhanced = []
-        for i, sub in enumerate(subtitles):
-            context = ""
-            if i > 0:
-                context += f"Previous: {subtitles[i - 1]['text']}\n"
-            context += f"Current: {sub['text']}\n"
-            if i < len(subtitles) - 1:
-                context += f"Next: {subtitles[i + 1]['text']}\n"
-            enhanced_text = sub['text']  # For now, just using original text
-            enhanced.append({"start": sub['start'], "end": sub['end'], "text": enhanced_text})
+        discard_handoff(synced_file)
+        enhanced = self._llm_enhance(subtitles) if self.llm is not None else subtitles
 
         def to_srt_time(sec):
-            h, m, s = int(sec // 3600), int((sec % 3600) // 60), sec % 60
-            ms = int((s - int(s)) * 1000)
-            return f"{h:02}:{m:02}:{int(s):02},{ms:03}"
-
-        srt_path = os.path.join(temp_dir, "enhanced_subtitles.srt")
-        with open(srt_path, 'w') as f:
-            for i, sub in enumerate(enhanced):
-                f.write(f"{i + 1}\n{to_srt_time(sub['start'])} --> {to_srt_time(sub['end'])}\n{sub['text']}\n\n")
+            s, ms = divmod(int(round(sec * 1000)), 1000)
+            m, s = divmod(s, 60)
+            h, m = divmod(m, 60)
+            return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+        lines = [
+            f"{i + 1}\n{to_srt_time(sub['start'])} --> {to_srt_time(sub['end'])}\n{sub['text']}\n\n"
+            for i, sub in enumerate(enhanced)
+        ]
+        srt_path = str(run_dir_of(synced_file) / "enhanced_subtitles.srt")
+        with open(srt_path, 'w', buffering=1 << 20) as f:
+            f.write("".join(lines))
         return srt_path
 
     async def _arun(self, synced_file: str) -> str:
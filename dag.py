@@ -1,6 +1,11 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import fs
 from lumi.dag import DAG
 from datetime import datetime
 from airflow.models import Param
@@ -10,16 +15,115 @@ from lumi.bigQueryInsertJobOperator import BigQueryInsertJobOperator
 from airflow.operators.python_operator import PythonOperator
 from airflow.operators.python_operator import PythonOperator
 from lumi_dq4bq.dvt_bq_reports import Reports
-from google.cloud import storage
 from google.cloud import bigquery, Client, QueryJobConfig
+from google.cloud.bigquery_storage import BigQueryReadClient
+
+# GCP project for query jobs (ensure credentials are configured on Airflow worker)
+GCP_PROJECT = "axp-lumi"
+
+
+# Clients are created on first use in a worker and then shared by every task and query
+# it runs, reusing their HTTP/gRPC connections; nothing is built when the scheduler parses this file
+@lru_cache(maxsize=None)
+def get_bq_client():
+    return bigquery.Client(project=GCP_PROJECT)
+
+
+@lru_cache(maxsize=None)
+def get_bqstorage_client():
+    return BigQueryReadClient()
+
+
+NUMERIC_TYPES = ("FLOAT64", "INT64")
+# The stats CTE carries 6 outputs per column; stay well under BigQuery's 10,000-column limit
+MAX_COLUMNS_PER_QUERY = 1000
+MAX_PARALLEL_QUERIES = 8
+STAT_COLUMNS = ["ric_count", "lumi_count", "ric_zero_count", "lumi_zero_count", "ric_mean", "lumi_mean"]
+
+
+def build_stats_query(columns, src_prj, src_tbl, dest_prj, dest_tbl):
+    """Aggregate every (column, data_type) pair over a single join scan, unpivoted to one row per column/Mkt."""
+    projections = []
+    aggregates = []
+    unpivot_sets = []
+    for i, (col, dtype) in enumerate(columns):
+        projections.append(f"a.{col} AS a_{i}, b.{col} AS b_{i}")
+        aggregates.append(f"COUNT(a_{i}) AS ric_count_{i}, COUNT(b_{i}) AS lumi_count_{i}")
+        if dtype in NUMERIC_TYPES:
+            # Numeric columns: calculate mean and zero counts
+            aggregates.append(
+                f"COUNTIF(a_{i} = 0) AS ric_zero_count_{i}, COUNTIF(b_{i} = 0) AS lumi_zero_count_{i}, "
+                f"AVG(a_{i}) AS ric_mean_{i}, AVG(b_{i}) AS lumi_mean_{i}"
+            )
+        else:
+            # String or categorical: only count matches
+            aggregates.append(
+                f"CAST(NULL AS INT64) AS ric_zero_count_{i}, CAST(NULL AS INT64) AS lumi_zero_count_{i}, "
+                f"CAST(NULL AS FLOAT64) AS ric_mean_{i}, CAST(NULL AS FLOAT64) AS lumi_mean_{i}"
+            )
+        unpivot_sets.append(f"({', '.join(f'{m}_{i}' for m in STAT_COLUMNS)}) AS '{col}'")
+
+    newline = ",\n         "
+    return f"""
+    WITH joined AS (
+      SELECT (CASE WHEN a.cust_mkt_cd = 'US' THEN 'US' ELSE 'INTL' END) AS Mkt,
+         {newline.join(projections)}
+      FROM `{src_prj}.{src_tbl}` a
+      INNER JOIN `{dest_prj}.{dest_tbl}` b ON a.cust_xref_id = b.cust_xref_id
+    ),
+    stats AS (
+      SELECT Mkt, COUNT(*) AS tot_cnt,
+         {newline.join(aggregates)}
+      FROM joined
+      GROUP BY Mkt
+    )
+    SELECT variable, Mkt, tot_cnt, {", ".join(STAT_COLUMNS)}
+    FROM stats
+    UNPIVOT (({", ".join(STAT_COLUMNS)}) FOR variable IN (
+         {newline.join(unpivot_sets)}
+    ))
+    """
+
+
+def query_to_frame(client, sql, bqstorage_client):
+    """Run sql and download the result through the Storage Read API as Arrow-backed columns."""
+    rows = client.query(sql).result()
+    return rows.to_arrow(bqstorage_client=bqstorage_client).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+SCHEMA_CACHE_DIR = "/tmp/bq_schema_cache"
+
 
-# Set GCP project environment (ensure credentials are configured on Airflow worker)
-os.environ["GOOGLE_CLOUD_PROJECT"] = "axp-lumi"
+def cached_columns(client, bqstorage_client, project, table):
+    """column_name -> data_type for a table, re-read from INFORMATION_SCHEMA only after the table changes."""
+    modified = client.get_table(f"{project}.{table}").modified
+    cache_path = os.path.join(SCHEMA_CACHE_DIR, f"{project}.{table}.{modified:%Y%m%d%H%M%S%f}.parquet")
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path)
+
+    query = f"SELECT column_name, data_type FROM `{project}`.INFORMATION_SCHEMA.COLUMNS WHERE table_name = '{table}'"
+    columns = query_to_frame(client, query, bqstorage_client).set_index("column_name")
+    os.makedirs(SCHEMA_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    columns.to_parquet(tmp_path)
+    os.replace(tmp_path, cache_path)
+    return columns
+
+
+def alert_ratio(ric, lumi, zero_denominator, absolute=False):
+    """(ric - lumi) / (ric + lumi) over float arrays, with zero denominators replaced by zero_denominator."""
+    diff = ric - lumi
+    if absolute:
+        np.abs(diff, out=diff)
+    denom = ric + lumi
+    np.copyto(denom, zero_denominator, where=denom == 0)
+    np.divide(diff, denom, out=diff)
+    return diff
 
 
 # Function to compare two BigQuery tables
 # Accepts table/project names and computes basic stats (count, mean, zero-count)
-# Saves result to CSV file with alert metrics
+# Saves result to a Parquet file with alert metrics
 
 
 # Define the DAG with dynamic parameters
@@ -31,70 +135,47 @@ def compare_tables_dynamic(params, **kwargs):
     dest_prj = params["dest_prj"]
     file_name = params["file_name"]
 
-    client = storage.Client()
-    result = pd.DataFrame()
-    slots = 100  # Max columns to query in one loop
+    client = get_bq_client()
+    bqstorage_client = get_bqstorage_client()
 
-    # Step 1: Fetch column metadata from source and destination tables
-    src_query = f"SELECT column_name, data_type FROM `{src_prj}`.INFORMATION_SCHEMA.COLUMNS WHERE table_name = '{src_tbl}'"
-    dest_query = f"SELECT column_name, data_type FROM `{dest_prj}`.INFORMATION_SCHEMA.COLUMNS WHERE table_name = '{dest_tbl}'"
-
-    src_df = client.query(src_query).to_dataframe().set_index("column_name")
-    dest_df = client.query(dest_query).to_dataframe().set_index("column_name")
+    # Step 1: Fetch column metadata from source and destination tables (cached until the table changes)
+    src_df = cached_columns(client, bqstorage_client, src_prj, src_tbl)
+    dest_df = cached_columns(client, bqstorage_client, dest_prj, dest_tbl)
 
     # Step 2: Join on common columns that have the same data type
     combined = src_df.join(dest_df, rsuffix="_dest", how="inner")
     combined = combined[combined.data_type == combined.data_type_dest]
-
-    # Step 3: For each chunk of columns, build and run query
-    for s in range(1 + len(combined) // slots):
-        query = ""
-    for col in combined.index[slots * s: slots * (s + 1)]:
-        dtype = combined.data_type[col]
-    if dtype in ["FLOAT64", "INT64"]:
-    # Numeric columns: calculate mean and zero counts
-        query += f"""
-     SELECT '{col}' AS variable, '{dtype}' AS data_type,
-     (CASE WHEN a.cust_mkt_cd = 'US' THEN 'US' ELSE 'INTL' END) AS Mkt,
-     COUNT(*) AS tot_cnt, COUNT(a.{col}) AS ric_count, COUNT(b.{col}) AS lumi_count,
-     SUM(CASE WHEN a.{col} = 0 THEN 1 ELSE 0 END) AS ric_zero_count,
-     SUM(CASE WHEN b.{col} = 0 THEN 1 ELSE 0 END) AS lumi_zero_count,
-     AVG(a.{col}) AS ric_mean, AVG(b.{col}) AS lumi_mean
-     FROM `{src_prj}.{src_tbl}` a
-     INNER JOIN `{dest_prj}.{dest_tbl}` b ON a.cust_xref_id = b.cust_xref_id
-     GROUP BY 1, 3
-     UNION ALL
-     """
-    else:
-    # String or categorical: only count matches
-        query += f"""
-     SELECT '{col}' AS variable, '{dtype}' AS data_type,
-     (CASE WHEN a.cust_mkt_cd = 'US' THEN 'US' ELSE 'INTL' END) AS Mkt,
-     NULL AS ric_zero_count, NULL AS lumi_zero_count,
-     NULL AS ric_mean, NULL AS lumi_mean,
-     COUNT(*) AS tot_cnt, COUNT(a.{col}) AS ric_count, COUNT(b.{col}) AS lumi_count
-     FROM `{src_prj}.{src_tbl}` a
-     INNER JOIN `{dest_prj}.{dest_tbl}` b ON a.cust_xref_id = b.cust_xref_id
-     GROUP BY 1, 3
-     UNION ALL
-     """
-
-    # Step 4: Execute query and collect results
-    if query:
-        df = client.query(query[:-10]).to_dataframe()  # remove trailing UNION ALL
-    result = pd.concat([result, df], ignore_index=True)
+    if combined.empty:
+        raise ValueError("No common columns found between source and target tables.")
+
+    # Step 3: Aggregate columns with one join scan per query; very wide tables are split into
+    # several queries, which are independent and run concurrently
+    columns = list(combined.data_type.items())
+    queries = [
+        build_stats_query(columns[i:i + MAX_COLUMNS_PER_QUERY], src_prj, src_tbl, dest_prj, dest_tbl)
+        for i in range(0, len(columns), MAX_COLUMNS_PER_QUERY)
+    ]
+
+    # Step 4: Execute queries and collect results
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_QUERIES, len(queries))) as executor:
+        frames = list(executor.map(lambda q: query_to_frame(client, q, bqstorage_client), queries))
+    result = pd.concat(frames, ignore_index=True)
+    result.insert(1, "data_type", result["variable"].map(combined.data_type))
 
     # Step 5: Compute alert metrics
-    result["Count_alert"] = (result["ric_count"] - result["lumi_count"]) / \
-                            (result["lumi_count"] + result["ric_count"]).replace(0, 1)
-    result["Zero_alert"] = abs(result["ric_zero_count"] - result["lumi_zero_count"]) / (
-            result["lumi_zero_count"] + result["ric_zero_count"]).replace(0, 1)
-    result["Mean_alert"] = abs(result["ric_mean"] - result["lumi_mean"]) / (
-            result["ric_mean"] + result["lumi_mean"]).replace(0, np.nan)
+    stats = {c: result[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in STAT_COLUMNS}
+    result["Count_alert"] = alert_ratio(stats["ric_count"], stats["lumi_count"], 1)
+    result["Zero_alert"] = alert_ratio(stats["ric_zero_count"], stats["lumi_zero_count"], 1, absolute=True)
+    result["Mean_alert"] = alert_ratio(stats["ric_mean"], stats["lumi_mean"], np.nan, absolute=True)
 
-    # Step 6: Output to local file
-    os.makedirs("LVT_results/LVT_dump", exist_ok=True)
-    result.to_csv(f"LVT_results/LVT_dump/{file_name}.csv", index=False)
+    # Step 6: Write Parquet to output_dir (local path or gs:// URI, streamed straight to GCS)
+    output_dir = params.get("output_dir", "LVT_results/LVT_dump")
+    if "://" not in output_dir:
+        output_dir = os.path.abspath(output_dir)
+    filesystem, dir_path = fs.FileSystem.from_uri(output_dir)
+    filesystem.create_dir(dir_path, recursive=True)
+    pq.write_table(pa.Table.from_pandas(result, preserve_index=False),
+                   f"{dir_path}/{file_name}.parquet", filesystem=filesystem)
 
 
 # Define the DAG with dynamic parameters
@@ -109,7 +190,8 @@ with DAG(
             "dest_tbl": Param("risk_indv_customer_bureau", type="string"),
             "src_prj": Param("axp-lumi.dw", type="string"),
             "dest_prj": Param("axp-lumi.dw", type="string"),
-            "file_name": Param("risk_indv_customer_final_2605", type="string")
+            "file_name": Param("risk_indv_customer_final_2605", type="string"),
+            "output_dir": Param("LVT_results/LVT_dump", type="string")
         }
 ) as dag:
     # Python task to execute the comparison logic
@@ -1,5 +1,6 @@
 from crewai import Task, Agent, Crew
 import json
+import orjson
 
 # ------------------------ #
 # Agent Definition
@@ -41,24 +42,55 @@ def build_json_parser_task(agent, records, unique_keys, has_nested, sample_entri
 # ------------------------ #
 # Utility Functions
 # ------------------------ #
-def extract_schema(data, prefix=""):
-    schema = {}
-    if isinstance(data, dict):
-        for key, value in data.items():
-            full_key = f"{prefix}.{key}" if prefix else key
-            schema.update(extract_schema(value, full_key))
-    elif isinstance(data, list):
-        for i, item in enumerate(data[:3]):
-            schema.update(extract_schema(item, prefix + "[]"))
-        if not data:
-            schema[prefix + "[]"] = "empty_list"
-    else:
-        schema[prefix] = type(data).__name__
-    return schema
+_TYPE_NAMES = {t: t.__name__ for t in (str, int, float, bool, type(None))}
+
+# Path component standing for "any item of this list" (rendered as "[]")
+LIST_ITEM = None
+
+def _is_nested(path):
+    # The old '"[]" in key or "." in key' test on the joined key; empty keys add no dot there
+    key = schema_key(path)
+    return "[]" in key or "." in key
+
+def extract_schema(data, prefix=()):
+    """Flat (path, type_name) pairs in document order plus whether any path is nested.
+
+    Paths are key tuples, joined only by schema_key.
+    """
+    schema = []
+    has_nested = False
+    # Explicit DFS stack; children are pushed in reverse so keys come out in document order
+    stack = [(data, prefix)]
+    while stack:
+        node, path = stack.pop()
+        if isinstance(node, dict):
+            stack.extend((value, path + (key,)) for key, value in reversed(node.items()))
+        elif isinstance(node, list):
+            item_path = path + (LIST_ITEM,)
+            if not node:
+                schema.append((item_path, "empty_list"))
+                has_nested = True
+            stack.extend((item, item_path) for item in reversed(node[:3]))
+        else:
+            node_type = type(node)
+            schema.append((path, _TYPE_NAMES.get(node_type) or node_type.__name__))
+            has_nested = has_nested or _is_nested(path)
+    return schema, has_nested
+
+def schema_key(path):
+    key = ""
+    for part in path:
+        if part is LIST_ITEM:
+            key += "[]"
+        elif key:
+            key += "." + part
+        else:
+            key = part
+    return key
 
 def parse_json_and_run(file_path):
-    with open(file_path, 'r') as f:
-        data = json.load(f)
+    with open(file_path, 'rb') as f:
+        data = orjson.loads(f.read())
 
     # Handle root-level dict or list
     if isinstance(data, dict):
@@ -72,9 +104,9 @@ def parse_json_and_run(file_path):
         raise ValueError("Unsupported JSON structure. Root must be list or dict.")
 
     # Extract schema
-    schema = extract_schema(data)
-    unique_keys = list(set(schema.keys()))
-    has_nested = any("[]" in key or "." in key for key in unique_keys)
+    schema, has_nested = extract_schema(data)
+    # Join each distinct path once; distinct tuples can still render the same (e.g. empty keys)
+    unique_keys = list(dict.fromkeys(map(schema_key, dict.fromkeys(path for path, _ in schema))))
     structural_issues = "Some records have missing or inconsistent keys."  # Optional enhancement
 
     task = build_json_parser_task(
@@ -1,11 +1,16 @@
 # mcp_client.py
 
+import asyncio
+import importlib.util
 import httpx
 import uuid
 import json
 
 MCP_ENDPOINT = "http://localhost:3333/rpc"  # FastMCP default dev URL
 
+# httpx only speaks HTTP/2 with the optional h2 package; asking for it without h2 raises ImportError
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
 # Sample input with nested AND/OR/NOT logic
 sample_segment_payload = {
     "segments": [
@@ -31,28 +36,43 @@ sample_segment_payload = {
     ]
 }
 
-def call_translate_segments():
-    payload = {
+def build_payload(segment_json: dict) -> dict:
+    return {
         "jsonrpc": "2.0",
         "id": str(uuid.uuid4()),
         "method": "translate_segments",
         "params": {
-            "segment_json": sample_segment_payload
+            "segment_json": segment_json
         }
     }
 
+def make_client() -> httpx.AsyncClient:
+    # One keep-alive client for all calls; HTTP/2 multiplexes concurrent RPCs when the
+    # h2 package (httpx[http2]) is installed, otherwise plain HTTP/1.1 keep-alive
+    return httpx.AsyncClient(http2=HTTP2_AVAILABLE, timeout=10)
+
+async def call_translate_segments(client: httpx.AsyncClient, segment_json: dict = sample_segment_payload):
     try:
-        response = httpx.post(MCP_ENDPOINT, json=payload, timeout=10)
+        response = await client.post(MCP_ENDPOINT, json=build_payload(segment_json))
         response.raise_for_status()
         result = response.json()
         if "result" in result:
             print("\n✅ Human-readable JSON Response:")
             print(json.dumps(result["result"], indent=2))
+            return result["result"]
         else:
             print("\n❌ Error in MCP response:", result.get("error", {}))
 
     except Exception as e:
         print(f"❌ MCP call failed: {e}")
 
+async def translate_many(segment_jsons):
+    async with make_client() as client:
+        return await asyncio.gather(*(call_translate_segments(client, s) for s in segment_jsons))
+
+async def main():
+    async with make_client() as client:
+        await call_translate_segments(client)
+
 if __name__ == "__main__":
-    call_translate_segments()
+    asyncio.run(main())
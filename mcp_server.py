@@ -1,65 +1,104 @@
 # mcp_server.py
 
-from typing import Union, List, Dict, Any
+from functools import lru_cache
+from typing import Union, List, Dict, Any, NamedTuple
 from mcp.server.fastmcp import FastMCP
 
 # Initialize MCP server
 mcp = FastMCP("SegmentRuleMCPServer", "Parses segment definitions and outputs human-readable rules as JSON.")
 
 # Utility: Map operators to readable phrases
+OPERATOR_PHRASES = {
+    "==": "equals",
+    "=": "is",
+    ">": "greater than",
+    "<": "less than",
+    ">=": "at least",
+    "<=": "at most",
+    "!=": "not equal to"
+}
+
 def format_operator(op: str) -> str:
-    return {
-        "==": "equals",
-        "=": "is",
-        ">": "greater than",
-        "<": "less than",
-        ">=": "at least",
-        "<=": "at most",
-        "!=": "not equal to"
-    }.get(op, op)
+    return OPERATOR_PHRASES.get(op, op)
 
 # Utility: Humanize field names (e.g., "user_age" -> "User Age")
+@lru_cache(maxsize=1024)
 def humanize_field(field: str) -> str:
     return field.replace("_", " ").title()
 
-# Leaf node condition
-def format_condition(cond: Dict[str, Any]) -> Dict[str, Any]:
-    field = humanize_field(cond["field"])
-    op = format_operator(cond["operator"])
-    val = cond["value"]
-    return {
-        "field": field,
-        "condition": op,
-        "value": val,
-        "description": f"{field} {op} {val}"
-    }
-
-# Recursive function to parse all/any/not structures
+# Node opcodes for compiled condition trees
+OP_ALL, OP_ANY, OP_NOT, OP_LEAF = 0, 1, 2, 3
+_GROUP_TYPES = {OP_ALL: "all", OP_ANY: "any", OP_NOT: "not"}
+
+class CompiledRules(NamedTuple):
+    """Condition tree flattened in post-order: every node's children precede it, the root is last."""
+    ops: List[int]
+    children: List[List[int]]
+    leaf_field: List[int]
+    leaf_op: List[int]
+    leaf_value: List[Any]
+    fields: List[str]
+    operators: List[str]
+
+# Flatten an all/any/not structure once; field and operator names are humanized per unique value
+def compile_conditions(cond_block: Union[Dict[str, Any], List]) -> CompiledRules:
+    compiled = CompiledRules([], [], [], [], [], [], [])
+    field_ids: Dict[str, int] = {}
+    op_ids: Dict[str, int] = {}
+
+    def intern(key: str, ids: Dict[str, int], names: List[str], fmt) -> int:
+        if key not in ids:
+            ids[key] = len(names)
+            names.append(fmt(key))
+        return ids[key]
+
+    def emit(op: int, children: List[int], field: int = -1, operator: int = -1, value: Any = None) -> int:
+        compiled.ops.append(op)
+        compiled.children.append(children)
+        compiled.leaf_field.append(field)
+        compiled.leaf_op.append(operator)
+        compiled.leaf_value.append(value)
+        return len(compiled.ops) - 1
+
+    def visit(block: Union[Dict[str, Any], List]) -> int:
+        if isinstance(block, list):
+            # fallback if list given directly
+            return emit(OP_ALL, [visit(c) for c in block])
+        if "all" in block:
+            return emit(OP_ALL, [visit(c) for c in block["all"]])
+        if "any" in block:
+            return emit(OP_ANY, [visit(c) for c in block["any"]])
+        if "not" in block:
+            return emit(OP_NOT, [visit(block["not"])])
+        field = intern(block["field"], field_ids, compiled.fields, humanize_field)
+        operator = intern(block["operator"], op_ids, compiled.operators, format_operator)
+        return emit(OP_LEAF, [], field, operator, block["value"])
+
+    visit(cond_block)
+    return compiled
+
+# Build the nested readable JSON from a compiled tree in a single forward pass
+def render_conditions(compiled: CompiledRules) -> Dict[str, Any]:
+    rendered: List[Dict[str, Any]] = []
+    for op, children, field, operator, val in zip(compiled.ops, compiled.children, compiled.leaf_field,
+                                                  compiled.leaf_op, compiled.leaf_value):
+        if op == OP_LEAF:
+            field_name = compiled.fields[field]
+            condition = compiled.operators[operator]
+            rendered.append({
+                "field": field_name,
+                "condition": condition,
+                "value": val,
+                "description": f"{field_name} {condition} {val}"
+            })
+        elif op == OP_NOT:
+            rendered.append({"type": "not", "child": rendered[children[0]]})
+        else:
+            rendered.append({"type": _GROUP_TYPES[op], "children": [rendered[c] for c in children]})
+    return rendered[-1]
+
 def parse_conditions(cond_block: Union[Dict[str, Any], List]) -> Dict[str, Any]:
-    if isinstance(cond_block, list):
-        # fallback if list given directly
-        return {
-            "type": "all",
-            "children": [parse_conditions(c) for c in cond_block]
-        }
-
-    if "all" in cond_block:
-        return {
-            "type": "all",
-            "children": [parse_conditions(c) for c in cond_block["all"]]
-        }
-    elif "any" in cond_block:
-        return {
-            "type": "any",
-            "children": [parse_conditions(c) for c in cond_block["any"]]
-        }
-    elif "not" in cond_block:
-        return {
-            "type": "not",
-            "child": parse_conditions(cond_block["not"])
-        }
-    else:
-        return format_condition(cond_block)
+    return render_conditions(compile_conditions(cond_block))
 
 # Main processor
 def generate_human_readable_json_nested(raw_segments: Dict[str, Any]) -> Dict[str, Any]:
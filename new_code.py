@@ -1,3 +1,69 @@
+import re
+
+# Column-name fragments that mark a column as numeric
+NUMERIC_HINT = re.compile(r'amt|cnt|id|score|val', re.IGNORECASE)
+
+
+# The stats CTE carries 7 outputs per column; stay well under BigQuery's 10,000-column limit
+MAX_COLUMNS_PER_QUERY = 1000
+
+
+def build_stats_query(columns, src_table, trg_table, pkSource, pkTarget):
+    # One join scan for every column in the chunk: project each column pair once, aggregate them
+    # all in a single GROUP BY, then UNPIVOT the wide row back to one row per (variable, Mkt)
+    projections = []
+    aggregates = []
+    unpivot_sets = []
+    for i, col in enumerate(columns):
+        projections.append(f"a.{col} AS a_{i}, b.{col} AS b_{i}")
+        # Determine data type (could be improved if types are returned in XCom)
+        # For now assume numeric types only if col name contains 'amt', 'cnt', 'id'
+        if NUMERIC_HINT.search(col):
+            aggregates.append(f"""'NUMERIC' AS data_type_{i},
+                COUNT(a_{i}) AS src_count_{i},
+                COUNT(b_{i}) AS trg_count_{i},
+                COUNTIF(a_{i}=0) AS src_zero_count_{i},
+                COUNTIF(b_{i}=0) AS trg_zero_count_{i},
+                AVG(a_{i}) AS src_mean_{i},
+                AVG(b_{i}) AS trg_mean_{i}""")
+        else:
+            aggregates.append(f"""'CATEGORICAL' AS data_type_{i},
+                COUNT(a_{i}) AS src_count_{i},
+                COUNT(b_{i}) AS trg_count_{i},
+                CAST(NULL AS INT64) AS src_zero_count_{i},
+                CAST(NULL AS INT64) AS trg_zero_count_{i},
+                CAST(NULL AS FLOAT64) AS src_mean_{i},
+                CAST(NULL AS FLOAT64) AS trg_mean_{i}""")
+        unpivot_sets.append(
+            f"(data_type_{i}, src_count_{i}, trg_count_{i}, src_zero_count_{i}, "
+            f"trg_zero_count_{i}, src_mean_{i}, trg_mean_{i}) AS '{col}'"
+        )
+
+    separator = ",\n                "
+    return f"""
+            WITH joined AS (
+              SELECT CASE WHEN a.cust_mkt_cd = 'US' THEN 'US' ELSE 'INTL' END AS Mkt,
+                {separator.join(projections)}
+              FROM `{src_table}` a
+              INNER JOIN `{trg_table}` b ON a.{pkSource} = b.{pkTarget}
+            ),
+            stats AS (
+              SELECT Mkt,
+                COUNT(*) AS tot_cnt,
+                {separator.join(aggregates)}
+              FROM joined
+              GROUP BY Mkt
+            )
+            SELECT variable, data_type, Mkt, tot_cnt, src_count, trg_count,
+                src_zero_count, trg_zero_count, src_mean, trg_mean
+            FROM stats
+            UNPIVOT ((data_type, src_count, trg_count, src_zero_count, trg_zero_count, src_mean, trg_mean)
+              FOR variable IN (
+                {separator.join(unpivot_sets)}
+              ))
+            """
+
+
 def generate_metric_query(**kwargs):
     task_instance = kwargs["ti"]
 
@@ -15,49 +81,19 @@ def generate_metric_query(**kwargs):
     src_cols = src_result[0].split(',')
     trg_cols = trg_result[0].split(',')
 
-    common_cols = list(set(src_cols).intersection(set(trg_cols)))
+    # Keep source order so the generated SQL is reproducible run to run
+    trg_col_set = set(trg_cols)
+    common_cols = [col for col in dict.fromkeys(src_cols) if col in trg_col_set]
 
     if not common_cols:
         raise ValueError("No common columns found between source and target tables.")
 
-    query = ""
-    for col in common_cols:
-        # Determine data type (could be improved if types are returned in XCom)
-        # For now assume numeric types only if col name contains 'amt', 'cnt', 'id'
-        if any(keyword in col.lower() for keyword in ['amt', 'cnt', 'id', 'score', 'val']):
-            query += f"""
-            SELECT '{col}' AS variable, 'NUMERIC' AS data_type,
-                CASE WHEN a.cust_mkt_cd = 'US' THEN 'US' ELSE 'INTL' END AS Mkt,
-                COUNT(*) AS tot_cnt,
-                COUNT(a.{col}) AS src_count,
-                COUNT(b.{col}) AS trg_count,
-                SUM(CASE WHEN a.{col}=0 THEN 1 ELSE 0 END) AS src_zero_count,
-                SUM(CASE WHEN b.{col}=0 THEN 1 ELSE 0 END) AS trg_zero_count,
-                AVG(a.{col}) AS src_mean,
-                AVG(b.{col}) AS trg_mean
-            FROM `{src_table}` a
-            INNER JOIN `{trg_table}` b ON a.{pkSource} = b.{pkTarget}
-            GROUP BY Mkt
-            UNION ALL
-            """
-        else:
-            query += f"""
-            SELECT '{col}' AS variable, 'CATEGORICAL' AS data_type,
-                CASE WHEN a.cust_mkt_cd = 'US' THEN 'US' ELSE 'INTL' END AS Mkt,
-                COUNT(*) AS tot_cnt,
-                COUNT(a.{col}) AS src_count,
-                COUNT(b.{col}) AS trg_count,
-                NULL AS src_zero_count,
-                NULL AS trg_zero_count,
-                NULL AS src_mean,
-                NULL AS trg_mean
-            FROM `{src_table}` a
-            INNER JOIN `{trg_table}` b ON a.{pkSource} = b.{pkTarget}
-            GROUP BY Mkt
-            UNION ALL
-            """
-
-    final_query = query.rstrip("UNION ALL\n")
+    # Wide tables are split into column chunks, each a single-scan SELECT; the chunks are
+    # parenthesised because every one opens its own WITH clause
+    final_query = "\n            UNION ALL\n".join(
+        "(" + build_stats_query(common_cols[i:i + MAX_COLUMNS_PER_QUERY], src_table, trg_table, pkSource, pkTarget) + ")"
+        for i in range(0, len(common_cols), MAX_COLUMNS_PER_QUERY)
+    )
 
     result_table = f"`{result_table}`"
     sql_stmt = f"""